@@ -0,0 +1,36 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+class Plan(NamedTuple):
+    final_val: int   # mL/hr (continuous/cyclic) or mL per feed (bolus)
+    actual_vol: int  # mL/day
+
+class Provision(NamedTuple):
+    total_kcal: float
+    total_prot: float
+    free_water: float
+    prot_gap: float
+
+# Both calculations are pure functions of hashable scalar widget values, so an
+# in-process LRU cache serves repeated inputs without Streamlit's argument
+# hashing and result pickling
+
+@lru_cache(maxsize=256)
+def compute_plan(target_kcal, med_kcal, density, count, continuous):
+    # Goal rate over `count` hours (continuous/cyclic) or volume per feed over
+    # `count` feeds (bolus), and the daily volume it delivers
+    net_kcal = max(0, target_kcal - med_kcal)
+    vol_needed = net_kcal / (density if density > 0 else 1)
+    if continuous:
+        final_val = int(5 * round((vol_needed / count) / 5))
+        if final_val == 0 and vol_needed > 0: final_val = 5
+    else:
+        final_val = int(10 * round((vol_needed / count) / 10))
+    return Plan(final_val, final_val * count)
+
+@lru_cache(maxsize=256)
+def compute_provision(actual_vol, density, prot_per_l, water_frac, med_kcal, prosource_prot, target_prot):
+    prosource_kcal = (prosource_prot / 20) * 80
+    total_kcal = (actual_vol * density) + med_kcal + prosource_kcal
+    total_prot = ((actual_vol / 1000) * prot_per_l) + prosource_prot
+    return Provision(total_kcal, total_prot, actual_vol * water_frac, target_prot - total_prot)
@@ -0,0 +1,210 @@
+import contextlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+
+MODULAR_SET = {'Prosource TF20', 'Nutrisource Fiber', 'MCT oil'}
+# Per-formula calculator inputs: kcal/mL, protein g/L, free water fraction
+FORMULA_DTYPE = np.dtype([('density', 'f8'), ('protein', 'f8'), ('water', 'f8')])
+
+# Bump when process_formulary's output changes so on-disk caches are rebuilt
+CACHE_FORMAT = 3
+
+TF_CSV, TF_CSV_FALLBACK, ONS_CSV = 'formulary.csv', 'formulary.xlsx - Sheet1.csv', 'supplement_formulary.csv'
+
+def num_col(s):
+    # First token of each cell as a number ("1,000 mL" -> 1000.0), 0.0 when it isn't one
+    first = s.str.split(n=1).str[0]
+    return pd.to_numeric(first.str.replace(',', '', regex=False), errors='coerce').fillna(0.0)
+
+def read_csv(csv_path):
+    # Every formulary cell is text, so columns are read as plain object columns of
+    # str with no type inference (dtype=str would become pandas' string dtype on
+    # newer versions); pandas also handles short rows, blank headers and NA markers
+    return pd.read_csv(csv_path, dtype=object)
+
+def process_formulary(df):
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    df = df.fillna("")
+
+    # Card View (For display)
+    # Built from one array per column (copy=False skips block consolidation),
+    # so slicing a few formula columns never touches the others. Every column
+    # is object dtype, so each array is a view into the filled frame's block
+    # rather than a copy; nothing else modifies that frame.
+    arrays = {c: df[c].to_numpy() for c in df.columns}
+    arrays['Nutrient/Attribute'] = arrays.pop(df.columns[0])
+    df_cards = pd.DataFrame(arrays, columns=['Nutrient/Attribute'] + list(df.columns[1:]), copy=False)
+    df_cards['Nutrient/Attribute'] = df_cards['Nutrient/Attribute'].astype('category')
+
+    # Calc View (For math/backend)
+    # Per-product numbers are read straight off the attribute rows, so the
+    # wide table is never transposed; df_calc only holds the derived columns.
+    attrs = df.set_index(df.columns[0])
+    labels = attrs.index.astype(str).str.replace('\n', ' ', regex=False).str.strip().to_numpy(dtype=object)
+
+    # The three "% Calories" rows follow protein, fat and CHO in that order
+    pct_labels = ['% Cal (Prot)', '% Cal (Fat)', '% Cal (CHO)']
+    pct_idx = np.flatnonzero(labels == '% Calories')[:len(pct_labels)]
+    labels[pct_idx] = pct_labels[:len(pct_idx)]
+
+    # Settle on the protein row once, by position, since labels need not be
+    # unique: the per-litre row, else the first Protein row. The per-litre row
+    # is normalised to "Protein (g/L)" unless another row already has that name.
+    prot_gl = np.flatnonzero([('Protein' in c and '(g/L)' in c) for c in labels])
+    prot_any = np.flatnonzero(['Protein' in c for c in labels])
+    prot_pos = prot_gl[0] if len(prot_gl) else (prot_any[0] if len(prot_any) else None)
+    if len(prot_gl) and 'Protein (g/L)' not in labels:
+        labels[prot_pos] = 'Protein (g/L)'
+    attrs.index = labels
+
+    df_calc = pd.DataFrame({'Product Name': attrs.columns})
+
+    if 'Density' in attrs.index:
+        df_calc['density_num'] = num_col(attrs.loc['Density']).to_numpy()
+
+    if prot_pos is not None:
+        df_calc['protein_num'] = num_col(attrs.iloc[prot_pos]).to_numpy()
+    else:
+        df_calc['protein_num'] = 0.0
+
+    # Water content as a fraction, 0.8 when missing or unparseable
+    water_row = [c for c in labels if 'Water' in c]
+    if water_row:
+        water = attrs.loc[water_row[0]].str.replace('%', '', regex=False).str.strip()
+        df_calc['water_frac'] = (pd.to_numeric(water, errors='coerce') / 100).fillna(0.8).to_numpy()
+    else:
+        df_calc['water_frac'] = 0.8
+
+    df_calc['Category'] = np.where(df_calc['Product Name'].isin(MODULAR_SET), 'Modular', 'Formula')
+
+    return df_cards, df_calc
+
+def read_parquet(path):
+    # split_blocks keeps one block per column, the same layout process_formulary
+    # builds, instead of pd.read_parquet's consolidated blocks
+    return pq.read_table(path).to_pandas(split_blocks=True)
+
+def write_atomic(path, write):
+    # write(tmp_path) goes to a temp file beside `path` that is then renamed over
+    # it, so a killed process or a concurrent rebuild never leaves a torn file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+def write_json(path, obj):
+    with open(path, 'w') as f:
+        json.dump(obj, f)
+
+def load_formulary(csv_path):
+    # Processed (df_cards, df_calc) for one CSV. Both frames are kept as Parquet
+    # next to the CSV and reused while the CSV's mtime matches the one recorded
+    # in the JSON sidecar, so cold starts skip parsing and cleaning entirely.
+    base = os.path.splitext(csv_path)[0]
+    cards_path, calc_path, meta_path = base + '.cards.parquet', base + '.calc.parquet', base + '.cache.json'
+    mtime = os.path.getmtime(csv_path)
+    try:
+        with open(meta_path) as f:
+            if json.load(f) == {'mtime': mtime, 'format': CACHE_FORMAT}:
+                return read_parquet(cards_path), read_parquet(calc_path)
+    except (OSError, ValueError):
+        # Missing, unreadable or torn cache files (pyarrow's ArrowInvalid is a
+        # ValueError) are a cache miss, never a missing formulary
+        pass
+
+    df_cards, df_calc = process_formulary(read_csv(csv_path))
+    try:
+        # The sidecar goes last, so it only ever vouches for complete Parquet files
+        write_atomic(cards_path, lambda p: df_cards.to_parquet(p, index=False, compression='zstd'))
+        write_atomic(calc_path, lambda p: df_calc.to_parquet(p, index=False, compression='zstd'))
+        write_atomic(meta_path, lambda p: write_json(p, {'mtime': mtime, 'format': CACHE_FORMAT}))
+    except OSError:
+        pass  # Read-only deploys just keep parsing the CSV
+    return df_cards, df_calc
+
+@dataclass(frozen=True)
+class LoadedData:
+    # Everything the app needs from the formulary CSVs, built once per cache entry
+    df_cards_tf: pd.DataFrame
+    df_calc_tf: pd.DataFrame
+    df_cards_ons: pd.DataFrame
+    df_calc_ons: pd.DataFrame
+    formula_list: list
+    formula_values: np.ndarray
+    formula_index: dict
+    tf_products: list
+    ons_products: list
+    tf_attr_lower: np.ndarray
+    ons_attr_lower: np.ndarray
+    version: tuple  # Source CSV mtimes; derived caches key on this, not on the frames
+
+def lower_categories(df_cards):
+    # Lowercased distinct nutrient names, in categorical code order
+    if df_cards.empty:
+        return np.array([], dtype=str)
+    return np.array([str(c).lower() for c in df_cards['Nutrient/Attribute'].cat.categories])
+
+def source_version():
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in (TF_CSV, TF_CSV_FALLBACK, ONS_CSV))
+
+# A cache_resource keeps one shared LoadedData per process. st.cache_data would
+# unpickle a fresh copy of every frame on each call; callers treat it as read-only.
+@st.cache_resource(show_spinner=False)
+def load_data():
+    # A missing or empty file leaves that section empty; anything else
+    # (e.g. a malformed CSV) should surface rather than be swallowed
+    missing = (FileNotFoundError, pd.errors.EmptyDataError)
+    try:
+        df_cards_tf, df_calc_tf = load_formulary(TF_CSV)
+    except missing:
+        try:
+            df_cards_tf, df_calc_tf = load_formulary(TF_CSV_FALLBACK)
+        except missing:
+            df_cards_tf, df_calc_tf = pd.DataFrame(), pd.DataFrame()
+
+    try:
+        df_cards_ons, df_calc_ons = load_formulary(ONS_CSV)
+    except missing:
+        df_cards_ons, df_calc_ons = pd.DataFrame(), pd.DataFrame()
+
+    # Calculator options (modulars excluded), their per-formula values as one
+    # structured array so they can also be used across all formulas at once,
+    # and each formula's position in it
+    formula_list, formula_values = [], np.zeros(0, dtype=FORMULA_DTYPE)
+    if not df_calc_tf.empty:
+        formulas = df_calc_tf.loc[df_calc_tf['Category'] == 'Formula']
+        formula_list = formulas['Product Name'].tolist()
+        formula_values = np.zeros(len(formulas), dtype=FORMULA_DTYPE)
+        formula_values['density'] = formulas['density_num'].to_numpy(dtype=float)
+        formula_values['protein'] = formulas['protein_num'].to_numpy(dtype=float)
+        formula_values['water'] = formulas['water_frac'].to_numpy(dtype=float)
+    formula_index = {name: i for i, name in enumerate(formula_list)}
+
+    # Card view filter options: every product column after the attribute names
+    tf_products = list(df_cards_tf.columns[1:])
+    ons_products = list(df_cards_ons.columns[1:])
+
+    return LoadedData(
+        df_cards_tf, df_calc_tf, df_cards_ons, df_calc_ons, formula_list, formula_values, formula_index, tf_products, ons_products,
+        lower_categories(df_cards_tf), lower_categories(df_cards_ons), source_version(),
+    )
+
+def nutrient_mask(df_cards, attr_lower, query):
+    # Match the query once per distinct nutrient name (attr_lower, aligned with
+    # the categories), then map the hits back onto the rows through the codes
+    hits = np.char.find(attr_lower, query.strip().lower()) >= 0
+    return hits[df_cards['Nutrient/Attribute'].cat.codes.to_numpy()]